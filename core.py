@@ -3,9 +3,13 @@ Core module that handles the conversion from notebook to HTML plus some utilitie
 """
 from __future__ import absolute_import, print_function, division
 
+import functools
+import importlib.util
 import os
 import re
-from copy import deepcopy
+from collections import namedtuple
+from copy import copy, deepcopy
+from urllib.parse import urlsplit
 
 import jinja2
 from pygments.formatters import HtmlFormatter
@@ -46,14 +50,8 @@ try:
 except ImportError:
     from IPython.nbconvert.nbconvertapp import NbConvertApp
 
-try:
-    from bs4 import BeautifulSoup
-except:
-    BeautifulSoup = None
-
-from pygments.formatters import HtmlFormatter
-
-from copy import deepcopy
+# older nbconvert versions can't exclude the prompts from the generated HTML
+EXCLUDE_PROMPTS = hasattr(HTMLExporter, 'exclude_input_prompt')
 
 
 LATEX_CUSTOM_SCRIPT = """
@@ -87,60 +85,330 @@ LATEX_CUSTOM_SCRIPT = """
 </script>
 """
 
+# markers of the Jupyter notebook CSS inside the CSS returned by nbconvert
+NOTEBOOK_CSS_START = '/*!\n*\n* IPython notebook\n*\n*/'
+NOTEBOOK_CSS_END = '/*!\n*\n* IPython notebook webapp\n*\n*/'
 
-def get_config():
-    """Load and return the user's nbconvert configuration
+# rules removed from the Jupyter CSS so they don't override the theme
+RE_COLOR_ZERO = re.compile(r'color\:\#0+(;)?')
+RE_RENDERED_HTML = re.compile(r'\.rendered_html[a-z0-9,._ ]*\{[a-z0-9:;%.#\-\s\n]+\}')
+
+# opening and closing tags of LATEX_CUSTOM_SCRIPT
+RE_SCRIPT_TAG = re.compile(r'^\s*<script[^>]*>|</script>\s*$')
+
+# full-width and non-breaking spaces are normalized to regular spaces
+WHITESPACE_TRANS = str.maketrans({'\u3000': ' ', '\xa0': ' '})
+
+# poster images accepted by the !mp4 template
+IMAGE_EXTENSIONS = frozenset(['.jpg', '.jpeg', '.png', '.svg'])
+
+# bootstrap classes added to every table
+TABLE_CLASSES = ['table', 'table-striped', 'table-responsive']
+
+
+_Soup = namedtuple('_Soup', ['BeautifulSoup', 'NavigableString', 'parser'])
+
+
+@functools.lru_cache(maxsize=1)
+def _import_soup():
+    """Import BeautifulSoup, and lxml if available, the first time a notebook is converted
+    so sites without notebooks don't pay for it. Returns None if bs4 is not installed
+    """
+    try:
+        from bs4 import BeautifulSoup, NavigableString
+    except ImportError:
+        return None
+
+    # C-based parser, a lot faster than the pure-python html.parser
+    parser = 'lxml' if importlib.util.find_spec('lxml') else 'html.parser'
+    return _Soup(BeautifulSoup, NavigableString, parser)
+
+
+@functools.lru_cache(maxsize=1)
+def _load_config():
+    """Load the user's nbconvert configuration, only once per process
     """
     app = NbConvertApp()
     app.load_config_file()
     return app.config
 
 
+def get_config():
+    """Return a copy of the user's nbconvert configuration
+    that can be updated without changing the cached one
+    """
+    return deepcopy(_load_config())
+
+
+_EXPORTER_CACHE = {}
+
+
+def get_exporter(preprocessors=[], template=None):
+    """Return the HTMLExporter and its SubCell preprocessor for the given
+    preprocessors and template, they are created once and reused afterwards.
+    The cells slice is set on the returned SubCell before each conversion.
+    """
+    key = (tuple(preprocessors), template)
+    if key not in _EXPORTER_CACHE:
+        template_file = 'basic'
+        extra_loaders = []
+        if template:
+            extra_loaders.append(jinja2.FileSystemLoader([os.path.dirname(template)]))
+            template_file = os.path.basename(template)
+
+        config = get_config()
+        config.update({'CSSHTMLHeaderTransformer': {
+                            'enabled': True,
+                            'highlight_class': '.highlight-ipynb'},
+                         'SubCell': {
+                            'enabled':True}})
+        if EXCLUDE_PROMPTS:
+            # the prompts are removed from the HTML anyway, don't generate them.
+            # set by attribute to keep the user's other TemplateExporter settings
+            config.TemplateExporter.exclude_input_prompt = True
+            config.TemplateExporter.exclude_output_prompt = True
+        sub_cell = SubCell(config=config)
+        exporter = HTMLExporter(config=config,
+                                template_file=template_file,
+                                extra_loaders=extra_loaders,
+                                filters={'highlight2html': custom_highlighter},
+                                preprocessors=[sub_cell] + preprocessors)
+
+        config.CSSHTMLHeaderPreprocessor.highlight_class = " .highlight pre "
+        _EXPORTER_CACHE[key] = exporter, sub_cell
+    return _EXPORTER_CACHE[key]
+
+
+def _build_article(values, class_str, style_str, mp4_options):
+    """Article cover for digests: title, link and cover image"""
+    title, link, image_filename = values
+    anchor_link = title.translate(WHITESPACE_TRANS).replace(' ', '-')
+    html_str = f"""
+    <h2 id="{anchor_link}">
+        <a href="{link}" target="_blank">{title}</a><a class="anchor-link" href="#{anchor_link}">¶</a>
+    </h2>
+    <center>
+        <a href="{link}" target="_blank">
+            <img src="{{static}}images/digests/{image_filename}" {style_str}>
+        </a>
+        <br>
+    </center>
+    """
+    return html_str
+
+
+def _build_quote(values, class_str, style_str, mp4_options):
+    """Block-quote with an optional author introduction"""
+    author_intro = ''
+    if len(values) > 1:
+        author_intro = f"""
+        <span style="float:right;margin-right: 1.5rem">─ {values[1]}</span>
+        """
+    html_str = f"""
+    <blockquote>
+        <p>
+            {values[0]}
+            <br>
+            {author_intro}
+            <br>
+        </p>
+    </blockquote>
+    """
+    return html_str
+
+
+def _build_mp4(values, class_str, style_str, mp4_options):
+    """Autoplaying mp4 video with an optional poster image and description"""
+    mp4_file, description, image_file, source_str, source_link = [''] * 5
+    if len(values) == 1:
+        mp4_file = values[0]
+    elif len(values) == 2:
+        for v in values:
+            v = v.lower()
+            # hosted files may have a query string, e.g. `a.mp4?raw=true`
+            extension = os.path.splitext(urlsplit(v).path)[1]
+            if extension == '.mp4':
+                mp4_file = v
+            elif extension in IMAGE_EXTENSIONS:
+                image_file = v
+            else:
+                description = v
+    elif len(values) == 3:
+        mp4_file, image_file, description = values
+        assert '.mp4' in mp4_file, '沒有對應的 mp4 檔案！'
+    elif len(values) == 4:
+        mp4_file, image_file, description, source_link = values
+        assert '.mp4' in mp4_file, '沒有對應的 mp4 檔案！'
+        assert 'http' in source_link, '沒有對應的網址！'
+
+    if description:
+        if source_link:
+            source_str = f"""
+            （<a href="{source_link}" target="_blank">圖片來源</a>）
+            """
+
+        description = f"""
+        <center>
+            {description}{source_str}
+            <br/>
+            <br/>
+        </center>
+        """
+    else:
+        description = '<br>'
+
+    html_str = f"""
+    <video {mp4_options} poster="{{static}}{image_file}" {class_str} {style_str}> 
+      <source src="{{static}}{mp4_file}" type="video/mp4">
+        您的瀏覽器不支援影片標籤，請留言通知我：S
+    </video>
+    {description}
+    """
+    return html_str
+
+
+def _build_image(values, class_str, style_str, mp4_options):
+    """Image with an optional description and source"""
+    if len(values) == 1:
+        html_str = f"""
+        <img {class_str} {style_str} src="{{static}}images/{values[0]}"/>
+        <br>
+        """
+    else:
+        description = values[1]
+        source_str = ''
+        if len(values) == 3:
+            source_link = values[2]
+            source_str = f"""
+            （<a href="{source_link}" target="_blank">圖片來源</a>）
+            """
+        elif len(values) == 4:
+            source_link, source_name = values[2:]
+            source_str = f"""
+            （圖片來源：<a href="{source_link}" target="_blank">{source_name}</a>）
+            """
+
+        html_str = f"""
+        <center>
+            <img {class_str} {style_str} src="{{static}}/images/{values[0]}">
+        </center>
+        <center>
+            {description}{source_str}
+            <br>
+            <br>
+        </center>
+        """
+    return html_str
+
+
+def _build_youtube(values, class_str, style_str, mp4_options):
+    """Embedded YouTube video with an optional description and period"""
+    period_str, description = '', ''
+    if len(values) == 1:
+        video_id = values[0]
+    elif len(values) == 2:
+        video_id, description = values
+    elif len(values) == 3:
+        video_id, description, start = values
+        period_str = f'?start={start}'
+    elif len(values) == 4:
+        video_id, description, start, end = values
+        period_str = f'?start={start}&end={end}'
+
+    if description:
+        description = f"""
+        <center>
+            {description}
+            <br/>
+            <br/>
+        </center>
+        """
+    else:
+        description = '<br>'
+
+    html_str = f"""
+    <div class="resp-container">
+        <iframe class="resp-iframe" 
+                src="https://www.youtube-nocookie.com/embed/{video_id}{period_str}" 
+                frameborder="0" 
+                allow="accelerometer; 
+                autoplay; encrypted-media; gyroscope; picture-in-picture" allowfullscreen>
+        </iframe>
+    </div>
+    {description}
+    """
+    return html_str
+
+
+# builders of the templated markdown cells, a cell is templated when its
+# first line is one of these keywords followed by a list of values
+TEMPLATE_BUILDERS = {
+    '!article': _build_article,
+    '!quote': _build_quote,
+    '!mp4': _build_mp4,
+    '!image': _build_image,
+    '!youtube': _build_youtube,
+}
+
+# the HTML post-processing only changes notebooks containing one of these strings,
+# prompts are only listed when the exporter can't be configured to not generate them
+POSTPROCESS_MARKERS = ('#ignore', '#blockquote', '<table') + tuple(TEMPLATE_BUILDERS)
+if not EXCLUDE_PROMPTS:
+    POSTPROCESS_MARKERS += ('prompt',)
+
+
 def get_html_from_filepath(filepath, start=0, end=None, preprocessors=[], template=None):
     """Return the HTML from a Jupyter Notebook
     """
-    template_file = 'basic'
-    extra_loaders = []
-    if template:
-        extra_loaders.append(jinja2.FileSystemLoader([os.path.dirname(template)]))
-        template_file = os.path.basename(template)
-
-    config = get_config()
-    config.update({'CSSHTMLHeaderTransformer': {
-                        'enabled': True,
-                        'highlight_class': '.highlight-ipynb'},
-                     'SubCell': {
-                        'enabled':True,
-                        'start':start,
-                        'end':end}})
-    exporter = HTMLExporter(config=config,
-                            template_file=template_file,
-                            extra_loaders=extra_loaders,
-                            filters={'highlight2html': custom_highlighter},
-                            preprocessors=[SubCell] + preprocessors)
-
-    config.CSSHTMLHeaderPreprocessor.highlight_class = " .highlight pre "
+    exporter, sub_cell = get_exporter(preprocessors=preprocessors, template=template)
+    sub_cell.start = start
+    sub_cell.end = end
     content, info = exporter.from_filename(filepath)
 
-    if BeautifulSoup:
-        soup = BeautifulSoup(content, 'html.parser')
-        for i in soup.findAll('div', {'class': 'input'}):
-            if i.findChildren()[1].find(text='#ignore') is not None:
-                i.extract()
+    soup_lib = None
+    if any(marker in content for marker in POSTPROCESS_MARKERS):
+        soup_lib = _import_soup()
+    if soup_lib:
+        soup = soup_lib.BeautifulSoup(content, soup_lib.parser)
+
+        # collect all the tags we modify in a single walk of the tree,
+        # they are modified afterwards so the tree is not mutated while iterating
+        input_divs, prompts, tables, text_cells = [], [], [], []
+        for tag in soup.descendants:
+            if tag.name == 'div':
+                classes = tag.get('class') or ()
+                if 'input' in classes:
+                    input_divs.append(tag)
+                if 'prompt' in classes:
+                    prompts.append(tag)
+                if 'text_cell_render' in classes:
+                    text_cells.append(tag)
+            elif tag.name == 'table':
+                tables.append(tag)
+
+        ignored_divs = []
+        for i in input_divs:
+            children = i.findChildren()
+            if len(children) < 2:
+                continue
+            code = children[1]
+            if code.find(text='#ignore') is not None:
+                ignored_divs.append(i)
 
             # transform code block to block-quote for pretty rendering
-            elif i.findChildren()[1].find(text='#blockquote') is not None:
+            elif code.find(text='#blockquote') is not None:
                 pre = i.find('pre')
                 parent_div = pre.parent # div to replace code with blockquote
 
                 # get raw text after block-quote keyword
-                raw_text = ''
+                parts = []
                 for e in pre.contents[2:]:
-                    try:
-                        raw_text += e.text
-                    except AttributeError:
-                        if e.replace('　', ' ').replace(' ', ' ') == ' ':
-                            raw_text += e
+                    if not isinstance(e, soup_lib.NavigableString):
+                        parts.append(e.text)
+                    elif e.isspace():
+                        # keep the spaces and line breaks between the highlighted words
+                        parts.append(e)
+                raw_text = ''.join(parts)
                 # delete <pre> tag from parent div
                 pre.extract()
 
@@ -151,32 +419,27 @@ def get_html_from_filepath(filepath, start=0, end=None, preprocessors=[], templa
                 block_quote.append(p)
                 parent_div.append(block_quote)
 
-        # remove input and output prompt
-        for prompt in soup.findAll('div', {'class': 'prompt'}):
-            prompt.extract()
+        # remove input and output prompt, still written by custom templates overriding them
+        # decompose is cheaper than extract since the removed tags are not kept
+        for prompt in prompts:
+            prompt.decompose()
 
         # add classes for tables to apply bootstrap style
         # for t in soup.findAll('table', {'class': 'dataframe'}):
-        for t in soup.findAll('table'):
-            t['class'] = t.get('class', []) + ['table', 'table-striped', 'table-responsive']
+        for t in tables:
+            t.attrs['class'] = (t.attrs.get('class') or []) + TABLE_CLASSES
 
         # generate html for templated markdown cells
         mp4_options = 'loop autoplay muted playsinline'  # mp4 video default options
-        for i in soup.findAll('div', {'class': 'text_cell_render'}):
+        for i in text_cells:
             class_str = ""
             style_str = ""
 
             texts = i.findChildren()
-            template_settings = {
-                '!article': ['article_title', 'article_link', 'image_filename'],
-                '!quote': ['quote_text', 'author_into'],
-                '!mp4': ['mp4_file', 'image_file', 'description'],
-                '!image': ['image_file', 'description', 'source_link', 'source_name'],
-                '!youtube': ['video_id', 'description', 'start', 'end'],
-            }
             # get settings for template keywords
             values = []
-            if texts and texts[0].text in template_settings:
+            builder = TEMPLATE_BUILDERS.get(texts[0].text) if texts else None
+            if builder is not None:
                 keyword = texts[0].text
                 for e in i.findAll('li'):
                     text = e.text
@@ -189,9 +452,10 @@ def get_html_from_filepath(filepath, start=0, end=None, preprocessors=[], templa
 
                     # special keyword for mp4 video options
                     elif keyword == '!mp4' and 'options:' in text:
-                        if 'no-loop' in text.replace('_', '-'):
+                        options = text.replace('_', '-')
+                        if 'no-loop' in options:
                             mp4_options = mp4_options.replace("loop ", "")
-                        if 'no-autoplay' in text.replace('_', '-'):
+                        if 'no-autoplay' in options:
                             mp4_options = mp4_options.replace("autoplay ", "")
                         if 'controls' in text:
                             mp4_options += " controls"
@@ -203,150 +467,7 @@ def get_html_from_filepath(filepath, start=0, end=None, preprocessors=[], templa
 
             if not values:
                 continue
-            html_str = ''
-            # article covers for digest
-            if keyword == '!article':
-                title, link, image_filename = values
-                anchor_link = title.replace(' ', ' ').replace('　', ' ').replace(' ', '-')
-                html_str = """
-                <h2 id="{anchor_link}">
-                    <a href="{link}" target="_blank">{title}</a><a class="anchor-link" href="#{anchor_link}">¶</a>
-                </h2>
-                <center>
-                    <a href="{link}" target="_blank">
-                        <img src="{{static}}images/digests/{image_filename}" {style_str}>
-                    </a>
-                    <br>
-                </center>
-                """.format(static='static', anchor_link=anchor_link,
-                           link=link, title=title, image_filename=image_filename, style_str=style_str)
-            elif keyword == '!quote':
-                author_intro = ''
-                if len(values) > 1:
-                    author_intro = """
-                    <span style="float:right;margin-right: 1.5rem">─ {author_intro}</span>
-                    """.format(author_intro=values[1])
-                html_str = """
-                <blockquote>
-                    <p>
-                        {quote}
-                        <br>
-                        {author_intro}
-                        <br>
-                    </p>
-                </blockquote>
-                """.format(quote=values[0], author_intro=author_intro)
-            elif keyword == '!mp4':
-                mp4_file, description, image_file, source_str, source_link = [''] * 5
-                if len(values) == 1:
-                    mp4_file = values[0]
-                elif len(values) == 2:
-                    for v in values:
-                        v = v.lower()
-                        if '.mp4' in v:
-                            mp4_file = v
-                        elif '.jpg' in v or '.png' in v or '.svg' in v or '.jpeg' in v:
-                            image_file = v
-                        else:
-                            description = v
-                elif len(values) == 3:
-                    mp4_file, image_file, description = values
-                    assert '.mp4' in mp4_file, '沒有對應的 mp4 檔案！'
-                elif len(values) == 4:
-                    mp4_file, image_file, description, source_link = values
-                    assert '.mp4' in mp4_file, '沒有對應的 mp4 檔案！'
-                    assert 'http' in source_link, '沒有對應的網址！'
-
-                if description:
-                    if source_link:
-                        source_str = """
-                        （<a href="{source_link}" target="_blank">圖片來源</a>）
-                        """.format(source_link=source_link)
-
-                    description = """
-                    <center>
-                        {description}{source_str}
-                        <br/>
-                        <br/>
-                    </center>
-                    """.format(description=description, source_str=source_str)
-                else:
-                    description = '<br>'
-
-                html_str = """
-                <video {mp4_options} poster="{{static}}{image_file}" {class_str} {style_str}> 
-                  <source src="{{static}}{mp4_file}" type="video/mp4">
-                    您的瀏覽器不支援影片標籤，請留言通知我：S
-                </video>
-                {description}
-                """.format(mp4_options=mp4_options, static='static', mp4_file=mp4_file, image_file=image_file,
-                           class_str=class_str, style_str=style_str, description=description)
-            elif keyword == '!image':
-                if len(values) == 1:
-                    html_str = """
-                    <img {class_str} {style_str} src="{{static}}images/{image_file}"/>
-                    <br>
-                    """.format(class_str=class_str, style_str=style_str, static='static', image_file=values[0])
-                else:
-                    description = values[1]
-                    source_str = ''
-                    if len(values) == 3:
-                        source_link = values[2]
-                        source_str = """
-                        （<a href="{source_link}" target="_blank">圖片來源</a>）
-                        """.format(source_link=source_link)
-                    elif len(values) == 4:
-                        source_link, source_name = values[2:]
-                        source_str = """
-                        （圖片來源：<a href="{source_link}" target="_blank">{source_name}</a>）
-                        """.format(source_link=source_link, source_name=source_name)
-
-                    html_str = """
-                    <center>
-                        <img {class_str} {style_str} src="{{static}}/images/{image_file}">
-                    </center>
-                    <center>
-                        {description}{source_str}
-                        <br>
-                        <br>
-                    </center>
-                    """.format(class_str=class_str, style_str=style_str, static='static', image_file=values[0],
-                               description=description, source_str=source_str)
-            elif keyword == '!youtube':
-                period_str, description = '', ''
-                if len(values) == 1:
-                    video_id = values[0]
-                elif len(values) == 2:
-                    video_id, description = values
-                elif len(values) == 3:
-                    video_id, description, start = values
-                    period_str = f'?start={start}'
-                elif len(values) == 4:
-                    video_id, description, start, end = values
-                    period_str = f'?start={start}&end={end}'
-
-                if description:
-                    description = """
-                    <center>
-                        {description}
-                        <br/>
-                        <br/>
-                    </center>
-                    """.format(description=description,)
-                else:
-                    description = '<br>'
-
-                html_str = """
-                <div class="resp-container">
-                    <iframe class="resp-iframe" 
-                            src="https://www.youtube-nocookie.com/embed/{video_id}{period_str}" 
-                            frameborder="0" 
-                            allow="accelerometer; 
-                            autoplay; encrypted-media; gyroscope; picture-in-picture" allowfullscreen>
-                    </iframe>
-                </div>
-                {description}
-                """.format(video_id=video_id, period_str=period_str, description=description)
+            html_str = builder(values, class_str, style_str, mp4_options)
 
             # delete existing template setting
             p = i.find('p')
@@ -355,52 +476,116 @@ def get_html_from_filepath(filepath, start=0, end=None, preprocessors=[], templa
             ul.extract()
 
             # insert generated html string
-            i.append(BeautifulSoup(html_str, 'html.parser'))
-
-        content = soup.decode(formatter="minimal")
+            # html.parser keeps the snippet as a fragment (lxml would wrap it in <html><body>)
+            i.append(soup_lib.BeautifulSoup(html_str, 'html.parser'))
+
+        # remove ignored input cells last, their prompts and tables were collected as well
+        for i in ignored_divs:
+            i.decompose()
+
+        # the "minimal" formatter is required: parsing decoded the entities escaped by
+        # nbconvert (e.g. `&lt;` in code cells) so they have to be escaped again
+        is_document = content.lstrip()[:15].lower().startswith(('<!doctype', '<html'))
+        if soup_lib.parser == 'lxml' and not is_document:
+            content = _decode_fragment(soup)
+        else:
+            content = soup.decode(formatter="minimal")
 
     return content, info
 
 
-def parse_css(content, info, fix_css=True, ignore_css=False):
+def _decode_fragment(soup):
+    """
+    Serialize a soup parsed by lxml from an HTML fragment.
+    lxml wraps fragments in <html><head><body>, moves any leading <style>, <script>,
+    <link> or <meta> into <head> and leaves leading comments outside <html>,
+    so everything is unwrapped to get back nbconvert's fragment
+    """
+    parts = []
+    for node in soup.contents:
+        if node.name == 'html':
+            for part in (node.find('head', recursive=False), node.find('body', recursive=False)):
+                if part is not None:
+                    parts.append(part.decode_contents(formatter="minimal"))
+        elif node.name is None:
+            # strings and comments
+            parts.append(node.output_ready(formatter="minimal"))
+        else:
+            parts.append(node.decode(formatter="minimal"))
+    return ''.join(parts)
+
+
+def _style_tag(styles):
+    return '<style type=\"text/css\">{0}</style>'.format(styles)
+
+
+def _filter_css(style):
+    """
+    This is a little bit of a Hack.
+    Jupyter returns a lot of CSS including its own bootstrap.
+    We try to get only the Jupyter Notebook CSS without the extra stuff.
+    """
+    index = style.find(NOTEBOOK_CSS_START)
+    if index > 0:
+        style = style[index:]
+    index = style.find(NOTEBOOK_CSS_END)
+    if index > 0:
+        style = style[:index]
+
+    style = RE_COLOR_ZERO.sub('', style)
+    style = RE_RENDERED_HTML.sub('', style)
+    return _style_tag(style)
+
+
+@functools.lru_cache(maxsize=64)
+def _filtered_css(styles):
+    """
+    Return the <style> tags of the filtered `styles` (a tuple of CSS strings)
+    nbconvert returns the same CSS for every notebook so this is cached
+    """
+    return '\n'.join(_filter_css(style) for style in styles)
+
+
+def parse_css(content, info, fix_css=True, ignore_css=False, latex_script_url=None):
     """
     General fixes for the notebook generated html
 
     fix_css is to do a basic filter to remove extra CSS from the Jupyter CSS
     ignore_css is to not include at all the Jupyter CSS
+    latex_script_url is to reference the MathJax loader saved with `save_latex_script`
+    instead of including LATEX_CUSTOM_SCRIPT in every notebook
     """
-    def style_tag(styles):
-        return '<style type=\"text/css\">{0}</style>'.format(styles)
-
-    def filter_css(style):
-        """
-        This is a little bit of a Hack.
-        Jupyter returns a lot of CSS including its own bootstrap.
-        We try to get only the Jupyter Notebook CSS without the extra stuff.
-        """
-        index = style.find('/*!\n*\n* IPython notebook\n*\n*/')
-        if index > 0:
-            style = style[index:]
-        index = style.find('/*!\n*\n* IPython notebook webapp\n*\n*/')
-        if index > 0:
-            style = style[:index]
-
-        style = re.sub(r'color\:\#0+(;)?', '', style)
-        style = re.sub(r'\.rendered_html[a-z0-9,._ ]*\{[a-z0-9:;%.#\-\s\n]+\}', '', style)
-        return style_tag(style)
+    if latex_script_url:
+        latex_script = '<script type="text/javascript" src="{0}"></script>'.format(latex_script_url)
+    else:
+        latex_script = LATEX_CUSTOM_SCRIPT
 
     if ignore_css:
-        content = content + LATEX_CUSTOM_SCRIPT
+        content = content + latex_script
         # content = content
     else:
         if fix_css:
-            jupyter_css = '\n'.join(filter_css(style) for style in info['inlining']['css'])
+            jupyter_css = _filtered_css(tuple(info['inlining']['css']))
         else:
-            jupyter_css = '\n'.join(style_tag(style) for style in info['inlining']['css'])
-        content = jupyter_css + content + LATEX_CUSTOM_SCRIPT
+            jupyter_css = '\n'.join(_style_tag(style) for style in info['inlining']['css'])
+        content = jupyter_css + content + latex_script
     return content
 
 
+def save_latex_script(filepath):
+    """
+    Save the javascript of LATEX_CUSTOM_SCRIPT (without the <script> tag) to filepath
+    so it can be shared by all the notebooks, see `latex_script_url` in `parse_css`.
+    The file is always overwritten so it follows changes of LATEX_CUSTOM_SCRIPT
+    """
+    dirname = os.path.dirname(filepath)
+    if dirname and not os.path.isdir(dirname):
+        os.makedirs(dirname, exist_ok=True)
+    script = RE_SCRIPT_TAG.sub('', LATEX_CUSTOM_SCRIPT)
+    with open(filepath, 'w', encoding='utf-8') as f:
+        f.write(script)
+
+
 def custom_highlighter(source, language='python', metadata=None):
     """
     Makes the syntax highlighting from pygments have prefix(`highlight-ipynb`)
@@ -438,6 +623,8 @@ class SubCell(Preprocessor):
     end = SliceIndex(None, config=True, help="last cell of notebook")
 
     def preprocess(self, nb, resources):
-        nbc = deepcopy(nb)
-        nbc.cells = nbc.cells[self.start:self.end]
+        # nbconvert already works on its own copy of the notebook,
+        # a shallow copy is enough to replace the list of cells
+        nbc = copy(nb)
+        nbc.cells = nb.cells[self.start:self.end]
         return nbc, resources
@@ -18,7 +18,7 @@ except ImportError:
 from pelican import signals
 from pelican.readers import MarkdownReader, HTMLReader, BaseReader
 
-from .ipynb import get_html_from_filepath, parse_css
+from .ipynb import get_html_from_filepath, parse_css, save_latex_script
 
 
 def register():
@@ -28,6 +28,30 @@ def register():
     def add_reader(arg):
         arg.settings["READERS"]["ipynb"] = IPythonNB
     signals.initialized.connect(add_reader)
+    signals.finalized.connect(write_latex_script)
+
+
+def write_latex_script(pelican):
+    """
+    Write the MathJax loader referenced by the notebooks when `IPYNB_LATEX_SCRIPT_SAVE_AS` is used.
+    This runs on every build, cached notebooks are not read again but still reference the file
+    """
+    if get_latex_script_url(pelican.settings):
+        latex_script_save_as = pelican.settings['IPYNB_LATEX_SCRIPT_SAVE_AS'].lstrip('/')
+        save_latex_script(os.path.join(pelican.output_path, latex_script_save_as))
+
+
+def get_latex_script_url(settings):
+    """
+    Return the URL of the MathJax loader saved with `IPYNB_LATEX_SCRIPT_SAVE_AS`,
+    or None when the script has to be included in every notebook.
+    The URL is the same for every page so it needs a SITEURL and can't be used with RELATIVE_URLS
+    """
+    latex_script_save_as = settings.get('IPYNB_LATEX_SCRIPT_SAVE_AS')
+    siteurl = settings.get('SITEURL', '')
+    if not latex_script_save_as or not siteurl or settings.get('RELATIVE_URLS'):
+        return None
+    return '{0}/{1}'.format(siteurl.rstrip('/'), latex_script_save_as.lstrip('/'))
 
 
 class IPythonNB(BaseReader):
@@ -130,7 +154,10 @@ class IPythonNB(BaseReader):
         # Write/fix content
         fix_css = self.settings.get('IPYNB_FIX_CSS', True)
         ignore_css = self.settings.get('IPYNB_SKIP_CSS', False)
-        content = parse_css(content, info, fix_css=fix_css, ignore_css=ignore_css)
+        # the script itself is written by `write_latex_script` once the site is generated
+        latex_script_url = get_latex_script_url(self.settings)
+        content = parse_css(content, info, fix_css=fix_css, ignore_css=ignore_css,
+                            latex_script_url=latex_script_url)
         if self.settings.get('IPYNB_NB_SAVE_AS'):
             output_path = self.settings.get('OUTPUT_PATH')
             nb_output_fullpath = self.settings.get('IPYNB_NB_SAVE_AS').format(**metadata)
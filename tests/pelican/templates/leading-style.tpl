@@ -0,0 +1,6 @@
+{%- extends 'basic.tpl' -%}
+
+{%- block body -%}
+<style>.bar { color: blue; }</style>
+{{ super() }}
+{%- endblock body -%}
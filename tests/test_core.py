@@ -0,0 +1,88 @@
+import os
+import sys
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(TESTS_DIR))
+
+import core  # noqa: E402
+import nbformat  # noqa: E402
+from nbformat.v4 import new_code_cell, new_notebook, new_output, new_raw_cell  # noqa: E402
+
+CONTENT_DIR = os.path.join(TESTS_DIR, 'pelican', 'content')
+TEMPLATES_DIR = os.path.join(TESTS_DIR, 'pelican', 'templates')
+
+
+def html_cell(html):
+    """A code cell with an HTML output, the table makes sure the HTML is post-processed"""
+    output = new_output('execute_result', data={'text/plain': '', 'text/html': html + '<table></table>'},
+                        execution_count=1)
+    return new_code_cell('a', execution_count=1, outputs=[output])
+
+
+def write_notebook(tmpdir, *cells):
+    filepath = os.path.join(str(tmpdir), 'notebook.ipynb')
+    nbformat.write(new_notebook(cells=list(cells)), filepath)
+    return filepath
+
+
+def test_leading_style_cell_is_kept():
+    # lxml moves a leading <style> into <head>, it must not be dropped
+    content, _info = core.get_html_from_filepath(os.path.join(CONTENT_DIR, 'with-style-cell.ipynb'))
+    assert '<style>.foo { color: red; }</style>' in content
+    assert '<html' not in content and '<body' not in content
+    assert 'table-striped' in content
+
+
+def test_leading_style_in_template_is_kept():
+    content, _info = core.get_html_from_filepath(os.path.join(CONTENT_DIR, 'with-style-cell.ipynb'),
+                                                 template=os.path.join(TEMPLATES_DIR, 'leading-style.tpl'))
+    assert '<style>.bar { color: blue; }</style>' in content
+    assert '<style>.foo { color: red; }</style>' in content
+    assert '<html' not in content and '<body' not in content
+
+
+def test_html_document_output_is_not_wrapped(tmpdir):
+    filepath = write_notebook(tmpdir, html_cell('<html><body><p>inner document</p></body></html>'))
+    content, _info = core.get_html_from_filepath(filepath)
+    assert 'inner document' in content
+    assert not content.lstrip().startswith('<html')
+    assert '<head>' not in content
+
+
+def test_script_with_html_string_is_not_wrapped(tmpdir):
+    filepath = write_notebook(tmpdir, html_cell('<script>var s = "<html>";</script>'))
+    content, _info = core.get_html_from_filepath(filepath)
+    assert '<script>var s = "<html>";</script>' in content
+    assert not content.lstrip().startswith('<html')
+    assert '<body' not in content
+
+
+def test_leading_comment_is_kept(tmpdir):
+    filepath = write_notebook(tmpdir, new_raw_cell('<!-- PELICAN_END_SUMMARY -->'), html_cell(''))
+    content, _info = core.get_html_from_filepath(filepath)
+    assert content.startswith('<!-- PELICAN_END_SUMMARY -->')
+    assert '<html' not in content
+
+
+def test_user_template_exporter_config_is_kept(tmpdir, monkeypatch):
+    config_dir = tmpdir.mkdir('jupyter')
+    config_dir.join('jupyter_nbconvert_config.py').write('c.TemplateExporter.exclude_input = True\n')
+    monkeypatch.setenv('JUPYTER_CONFIG_DIR', str(config_dir))
+    core._load_config.cache_clear()
+    core._EXPORTER_CACHE.clear()
+    try:
+        filepath = write_notebook(tmpdir, html_cell('<p>output</p>'))
+        content, _info = core.get_html_from_filepath(filepath)
+    finally:
+        core._load_config.cache_clear()
+        core._EXPORTER_CACHE.clear()
+    assert '<p>output</p>' in content
+    assert 'input_area' not in content
+    assert 'prompt' not in content
+
+
+def test_blockquote_keeps_line_breaks(tmpdir):
+    filepath = write_notebook(tmpdir, new_code_cell('#blockquote\nThe quick brown\nfox jumps over',
+                                                    execution_count=1))
+    content, _info = core.get_html_from_filepath(filepath)
+    assert '<blockquote><p>\nThe quick brown\nfox jumps over\n</p></blockquote>' in content
@@ -0,0 +1,48 @@
+import importlib
+import importlib.util
+import os
+import sys
+from types import SimpleNamespace
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# the plugin is a package named `ipynb`, load it from the repository root
+spec = importlib.util.spec_from_file_location('ipynb', os.path.join(ROOT_DIR, '__init__.py'),
+                                              submodule_search_locations=[ROOT_DIR])
+ipynb = importlib.util.module_from_spec(spec)
+sys.modules['ipynb'] = ipynb
+spec.loader.exec_module(ipynb)
+markup = importlib.import_module('ipynb.markup')
+
+
+def test_latex_script_is_written_and_referenced(tmpdir):
+    settings = {'SITEURL': 'https://example.com/', 'IPYNB_LATEX_SCRIPT_SAVE_AS': '/js/mathjax-init.js'}
+    markup.write_latex_script(SimpleNamespace(settings=settings, output_path=str(tmpdir)))
+
+    with open(os.path.join(str(tmpdir), 'js', 'mathjax-init.js'), encoding='utf-8') as f:
+        script = f.read()
+    assert 'mathjaxscript' in script
+    assert '<script' not in script and '</script>' not in script
+
+    url = markup.get_latex_script_url(settings)
+    assert url == 'https://example.com/js/mathjax-init.js'
+    content = markup.parse_css('<p>notebook</p>', {'inlining': {'css': []}}, latex_script_url=url)
+    assert content == '<p>notebook</p><script type="text/javascript" src="{0}"></script>'.format(url)
+
+
+def test_latex_script_is_overwritten(tmpdir):
+    filepath = os.path.join(str(tmpdir), 'mathjax-init.js')
+    with open(filepath, 'w') as f:
+        f.write('stale')
+    markup.save_latex_script(filepath)
+    with open(filepath, encoding='utf-8') as f:
+        assert 'mathjaxscript' in f.read()
+
+
+def test_latex_script_is_inlined_without_siteurl(tmpdir):
+    for settings in ({'SITEURL': '', 'IPYNB_LATEX_SCRIPT_SAVE_AS': 'js/mathjax-init.js'},
+                     {'SITEURL': 'https://example.com', 'RELATIVE_URLS': True,
+                      'IPYNB_LATEX_SCRIPT_SAVE_AS': 'js/mathjax-init.js'}):
+        assert markup.get_latex_script_url(settings) is None
+        markup.write_latex_script(SimpleNamespace(settings=settings, output_path=str(tmpdir)))
+        assert not os.path.exists(os.path.join(str(tmpdir), 'js'))